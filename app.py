@@ -3,14 +3,134 @@ Speech Transcript Generator - Streamlit Version
 Convert slide PDFs into professional speech transcripts using GPT-5.1/o3/GPT-4o models
 """
 
+import io
 import os
-import base64
+import multiprocessing
+import asyncio
+import queue
+import re
+import subprocess
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from datetime import datetime
-from typing import List, Dict, Optional
-import fitz  # PyMuPDF
-from pydub import AudioSegment
-from openai import OpenAI
+from typing import TYPE_CHECKING, Any, Callable, Iterator, List, Dict, Optional
+try:
+    # SIMD-accelerated, and encodes straight to str without an extra bytes copy
+    from pybase64 import b64encode_as_string as _b64encode_str
+except ImportError:
+    import base64
+    
+    def _b64encode_str(data: bytes) -> str:
+        return base64.b64encode(data).decode()
+import mutagen
+from slide_renderer import NO_TEXT_PLACEHOLDER, iter_rendered_pages, render_pages
+
+# PyMuPDF and openai are heavy imports, so they are loaded on first use to
+# keep the initial page load fast
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+
+# Parallel rasterization: decks from this many pages go to worker processes,
+# smaller ones are rendered serially on the background thread
+_PARALLEL_RENDER_MIN_PAGES = 32
+_RENDER_WORKERS = min(8, os.cpu_count() or 1)
+_MIN_RENDER_BATCH = 4
+_MAX_RENDER_BATCH = 16
+
+# Vision requests: slides per concurrent API call
+_SLIDES_PER_REQUEST = 5
+
+# Completion budget per request, derived from the batch's target word count
+_MIN_COMPLETION_TOKENS = 512
+_COMPLETION_TOKEN_BUFFER = 256
+_TIPS_TOKENS_PER_SLIDE = 150
+# A request cut off at its token limit is retried once with this many times the budget
+_TRUNCATION_RETRY_FACTOR = 2
+_TRUNCATION_NOTE = "[Transcript cut off at the token limit]"
+_REASONING_TOKEN_HEADROOM = 4000
+_REASONING_MODEL_PREFIXES = ("o1", "o3", "o4", "gpt-5")
+# Heading forms a batch is stopped at for the next batch's first slide
+# (the API accepts at most 4 stop sequences)
+_STOP_HEADING_PREFIXES = ("", "**", "## ", "### ")
+
+# Large decks: cap on in-flight requests and outline length per preceding slide
+_MAX_CONCURRENT_REQUESTS = 8
+_OUTLINE_CHARS_PER_SLIDE = 80
+
+# Seconds between progress refreshes while upload processing runs in the background
+_BACKGROUND_POLL_INTERVAL = 0.1
+
+# Audio containers whisper-1 accepts as uploaded, so no transcoding is needed
+_WHISPER_AUDIO_TYPES = ['flac', 'm4a', 'mp3', 'mp4', 'mpeg', 'mpga', 'oga', 'ogg', 'wav', 'webm']
+
+# "Slide N" heading lines in model output, tolerating markdown emphasis and
+# an optional title after a colon or dash ("Slide 3: Introduction"). Titles
+# are short and carry no clause punctuation, so prose that starts with
+# "Slide N –" is not mistaken for a heading
+_SLIDE_TITLE_MAX_CHARS = 60
+_SLIDE_HEADING = re.compile(
+    r"^[#*\s]*Slide (\d+)[ \t*]*"
+    rf"(?:[:：\-–—][ \t]*([^\n.,;。，；]{{1,{_SLIDE_TITLE_MAX_CHARS}}}?))?[ \t*]*$",
+    re.MULTILINE
+)
+
+# Shared HTTP pool for OpenAI calls; HTTP/2 multiplexes concurrent requests.
+# Keep every pooled connection alive so concurrent batch requests reuse warm
+# sockets instead of redoing TCP+TLS handshakes; idle sockets outlive httpx's
+# 5s default so they are still warm between Generate clicks
+_HTTP_MAX_CONNECTIONS = 32
+_HTTP_KEEPALIVE_CONNECTIONS = 32
+_HTTP_KEEPALIVE_EXPIRY = 120.0
+
+# str.translate table deleting every Unicode whitespace character (the highest
+# is U+3000, the ideographic space)
+_WHITESPACE_TABLE = dict.fromkeys(code for code in range(0x3001) if chr(code).isspace())
+
+
+def _ffprobe(audio_bytes: bytes, *args: str) -> str:
+    """Run ffprobe on in-memory audio and return its stdout"""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", *args, "-i", "pipe:0"],
+        input=audio_bytes,
+        capture_output=True,
+        check=True
+    )
+    return result.stdout.decode()
+
+
+def _probe_duration(audio_bytes: bytes) -> float:
+    """Read audio duration in seconds with ffprobe, without decoding the stream"""
+    output = _ffprobe(audio_bytes, "-show_entries", "format=duration", "-of", "default=nw=1:nk=1")
+    try:
+        return float(output)
+    except ValueError:
+        pass
+    
+    # Streamed containers (e.g. webm) report N/A, so take the end of the last audio packet
+    output = _ffprobe(
+        audio_bytes, "-select_streams", "a:0",
+        "-show_entries", "packet=pts_time,duration_time", "-of", "csv=p=0"
+    )
+    duration = 0.0
+    for line in output.splitlines():
+        fields = line.split(",")
+        try:
+            end_time = float(fields[0])
+        except ValueError:
+            continue
+        # Packet durations are often N/A too; the start time alone still counts
+        try:
+            end_time += float(fields[1])
+        except (IndexError, ValueError):
+            pass
+        duration = max(duration, end_time)
+    if not duration:
+        raise Exception("Unable to determine audio duration, please upload an MP3, M4A or WAV file")
+    return duration
 
 
 class PDFProcessor:
@@ -18,36 +138,65 @@ class PDFProcessor:
     
     def __init__(self):
         self.slides_content = []
+        self.page_count = 0
+    
+    def iter_slides(self, pdf_file, render_pool: Optional[ProcessPoolExecutor] = None) -> Iterator[Dict[str, Any]]:
+        """Yield slide dicts in page order, using render_pool for large decks"""
+        import fitz  # PyMuPDF
+        
+        # Parse the upload from memory instead of a temp file
+        pdf_bytes = pdf_file.getvalue()
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        self.page_count = len(doc)
+        doc.close()
+        
+        if self.page_count == 0:
+            raise Exception("This PDF file does not contain any pages")
+        
+        if render_pool is None or self.page_count < _PARALLEL_RENDER_MIN_PAGES:
+            yield from iter_rendered_pages(pdf_bytes, list(range(self.page_count)))
+            return
+        
+        # Spread pages over the workers in bounded chunks
+        batch_size = -(-self.page_count // _RENDER_WORKERS)
+        batch_size = max(_MIN_RENDER_BATCH, min(_MAX_RENDER_BATCH, batch_size))
+        batches = [
+            list(range(start, min(start + batch_size, self.page_count)))
+            for start in range(0, self.page_count, batch_size)
+        ]
+        
+        # MuPDF rendering holds the GIL, so use processes rather than threads
+        for attempt in range(2):
+            try:
+                futures = [render_pool.submit(render_pages, pdf_bytes, batch) for batch in batches]
+                for future in futures:
+                    yield from future.result()
+                    batches = batches[1:]
+                return
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory on a huge page), which
+                # breaks the whole pool: retry the remaining pages once on a fresh one
+                render_pool = _replace_render_pool(render_pool)
+                if attempt:
+                    raise
     
-    def extract_slides(self, pdf_file) -> List[Dict[str, str]]:
-        """Extract content from each page of the PDF"""
+    def extract_slides(
+        self,
+        pdf_file,
+        progress: Optional[Dict[str, int]] = None,
+        render_pool: Optional[ProcessPoolExecutor] = None
+    ) -> List[Dict[str, Any]]:
+        """Extract content from each page of the PDF, counting rendered pages in progress"""
+        if progress is None:
+            progress = {}
         try:
-            # Save uploaded PDF
-            pdf_path = "/tmp/presentation.pdf"
-            with open(pdf_path, 'wb') as f:
-                f.write(pdf_file.read())
-            
-            doc = fitz.open(pdf_path)
-            
-            if len(doc) == 0:
-                doc.close()
-                raise Exception("This PDF file does not contain any pages")
-            
             slides = []
+            for slide in self.iter_slides(pdf_file, render_pool):
+                slides.append(slide)
+                # The poll loop reads done once total is set, so write done first
+                progress["done"] = len(slides)
+                progress["total"] = self.page_count
             
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text().strip()
-                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                img_data = pix.tobytes("png")
-                
-                slides.append({
-                    "page": page_num + 1,
-                    "text": text if text else "[No text content on this page]",
-                    "image": base64.b64encode(img_data).decode()
-                })
-            
-            doc.close()
             self.slides_content = slides
             return slides
             
@@ -58,46 +207,40 @@ class PDFProcessor:
 class AudioAnalyzer:
     """Analyze audio and calculate speech rate using GPT-4o Audio API"""
     
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, client: "OpenAI"):
+        self.client = client
         self.words_per_minute = None
     
-    def _convert_to_mp3(self, audio_path: str) -> str:
-        """Convert audio format to mp3"""
+    def _get_duration(self, audio_bytes: bytes) -> float:
+        """Read audio duration in seconds from the container metadata"""
         try:
-            audio = AudioSegment.from_file(audio_path)
-            mp3_path = "/tmp/converted_audio.mp3"
-            audio.export(mp3_path, format="mp3", bitrate="128k")
-            return mp3_path
-        except Exception as e:
-            raise Exception(f"Audio format conversion error: {str(e)}")
+            metadata = mutagen.File(io.BytesIO(audio_bytes))
+        except mutagen.MutagenError:
+            metadata = None
+        if metadata is not None and metadata.info.length:
+            return metadata.info.length
+        # Unrecognized container: ask ffprobe, which also reads only the header
+        return _probe_duration(audio_bytes)
     
     def analyze_audio(self, audio_file) -> float:
         """Analyze audio and calculate speech rate using GPT-4o Audio API"""
         try:
-            # Save uploaded audio
-            audio_path = "/tmp/audio_sample.m4a"
-            with open(audio_path, 'wb') as f:
-                f.write(audio_file.read())
+            audio_bytes = audio_file.getvalue()
+            filename = getattr(audio_file, "name", None) or "audio_sample.m4a"
             
-            audio = AudioSegment.from_file(audio_path)
-            duration_seconds = len(audio) / 1000.0
+            duration_seconds = self._get_duration(audio_bytes)
             
             if duration_seconds < 5:
                 raise Exception("Audio duration too short (less than 5 seconds), suggest uploading around 20 seconds")
             if duration_seconds > 120:
                 raise Exception("Audio duration too long (over 2 minutes), please upload a 20-60 second audio sample")
             
-            # Convert to mp3
-            mp3_path = self._convert_to_mp3(audio_path)
-            
-            # Transcribe using GPT-4o Audio API
-            with open(mp3_path, 'rb') as audio_file:
-                transcription = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="zh"
-                )
+            # Every accepted upload type is native to Whisper, so send the original bytes
+            transcription = self.client.audio.transcriptions.create(
+                model="whisper-1",
+                file=(filename, audio_bytes),
+                language="zh"
+            )
             
             text = transcription.text
             
@@ -105,32 +248,136 @@ class AudioAnalyzer:
                 raise Exception("Unable to recognize audio content, please ensure audio is clear and contains speech")
             
             # Calculate word count
-            char_count = len([c for c in text if c.strip() and not c.isspace()])
+            char_count = len(text.translate(_WHITESPACE_TABLE))
             wpm = (char_count / duration_seconds) * 60
             self.words_per_minute = wpm
             
-            # Clean up temporary files
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
-            if os.path.exists(mp3_path):
-                os.remove(mp3_path)
-            
             return wpm
             
         except Exception as e:
             raise Exception(f"Audio analysis error: {str(e)}")
 
 
+# Prompt text, built once at import
+_STYLE_DESCRIPTIONS = {
+    "Lively": "Use a relaxed, lively tone with appropriate interactive and humorous elements",
+    "Serious": "Use a formal, professional tone maintaining academic rigor",
+    "Motivational": "Use inspiring language full of positive energy and motivation",
+    "Educational": "Use clear, easy-to-understand explanations, as if teaching students",
+    "Conversational": "Use a conversational tone, as if talking face-to-face with the audience"
+}
+_DEFAULT_STYLE_DESCRIPTION = "Use a natural and smooth tone"
+
+_LANGUAGE_INSTRUCTIONS = {
+    "Traditional Chinese": "Output in Traditional Chinese",
+    "English": "Output in English",
+    "Simplified Chinese": "Output in Simplified Chinese",
+    "Japanese": "Output in Japanese",
+    "Korean": "Output in Korean",
+    "Spanish": "Output in Spanish",
+    "French": "Output in French",
+    "German": "Output in German"
+}
+_DEFAULT_LANGUAGE_INSTRUCTION = "Output in Traditional Chinese"
+
+_TIPS_INSTRUCTION = """
+
+【Speech Tips Suggestions】
+Please include the following speech tips in appropriate places within the transcript (marked with [square brackets]):
+- [Gesture: Open arms] - When emphasizing a key point
+- [Gesture: Point to slide] - When explaining a chart
+- [Tone: Raise volume] - For key messages
+- [Tone: Slow down] - For important concepts
+- [Pause 2-3 seconds] - During section transitions
+- [Eye contact] - When interacting with the audience
+- [Movement: Move to center stage] - During opening or closing
+"""
+
+_TIPS_REQUIREMENT = """
+7. Include speech tips suggestions in appropriate places, marked with [square brackets], including:
+   - Gesture suggestions (e.g., open arms, point to slide, clench fist for emphasis)
+   - Tone suggestions (e.g., raise volume, slow down, emphasize)
+   - Pause timing (e.g., [Pause 2-3 seconds])
+   - Body language (e.g., eye contact, movement, lean forward)
+   These suggestions should blend naturally into the transcript to help the speaker better convey the message
+"""
+
+_SYSTEM_PROMPT_TEMPLATE = """
+{role_intro}You are an experienced speaker and content creation expert.
+
+Speech Topic: {topic}
+Target Audience: {audience}
+Speech Style: {style_desc}
+Language Requirement: {lang_inst}
+
+Your task is to create a natural, smooth, and engaging speech transcript based on the provided slide content.
+
+Requirements:
+1. Content must be faithful to the slides but expressed in spoken language
+2. Approximately {words_per_slide} words per page, adjustable based on content importance
+3. Opening must be attractive, closing must be powerful
+4. Add transition phrases appropriately to ensure smooth flow
+5. Match the specified speech style and target audience
+6. Ensure content is professional and accurate, yet easy to understand{tips_requirement}
+"""
+
+
+def _build_system_prompt(
+    style: str,
+    topic: str,
+    audience: str,
+    language: str,
+    expert_role: Optional[str],
+    words_per_slide: int,
+    include_tips: bool
+) -> str:
+    """Build the system prompt shared by every batch request of a run"""
+    role_intro = f"You are a {expert_role}, " if expert_role else ""
+    
+    return _SYSTEM_PROMPT_TEMPLATE.format_map({
+        "role_intro": role_intro,
+        "topic": topic,
+        "audience": audience,
+        "style_desc": _STYLE_DESCRIPTIONS.get(style, _DEFAULT_STYLE_DESCRIPTION),
+        "lang_inst": _LANGUAGE_INSTRUCTIONS.get(language, _DEFAULT_LANGUAGE_INSTRUCTION),
+        "words_per_slide": words_per_slide,
+        "tips_requirement": _TIPS_REQUIREMENT if include_tips else ""
+    })
+
+
+def _generation_error(error: Exception) -> Exception:
+    """Translate an API failure into the message shown to the user"""
+    error_msg = str(error)
+    if "API key" in error_msg or "authentication" in error_msg.lower():
+        return Exception("❌ API Key error, please check if your OpenAI API Key is correct")
+    elif "rate limit" in error_msg.lower():
+        return Exception("❌ API request limit reached, please try again later")
+    elif "quota" in error_msg.lower():
+        return Exception("❌ API quota exceeded, please check your OpenAI account balance")
+    else:
+        return Exception(f"Transcript generation error: {error_msg}")
+
+
+def _trim_to_batch(text: str, last_page: int) -> str:
+    """Cut a batch's output at the first heading for a slide after its last one"""
+    for match in _SLIDE_HEADING.finditer(text):
+        if int(match.group(1)) > last_page:
+            return text[:match.start()]
+    return text
+
+
 class TranscriptGenerator:
     """Generate speech transcript using OpenAI Vision models"""
     
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, client: "AsyncOpenAI", loop: asyncio.AbstractEventLoop):
+        self.client = client
+        # Long-lived loop the client's connection pool is bound to
+        self.loop = loop
         self.transcript = ""
     
     def generate_transcript(
         self,
-        slides: List[Dict[str, str]],
+        slides: List[Dict[str, Any]],
         target_duration: int,
         words_per_minute: float,
         style: str,
@@ -139,171 +386,471 @@ class TranscriptGenerator:
         language: str,
         model_name: str = "gpt-5.1",
         expert_role: Optional[str] = None,
-        include_tips: bool = False
+        include_tips: bool = False,
+        on_update: Optional[Callable[[int, str, bool], None]] = None
     ) -> str:
-        """Generate speech transcript"""
+        """Generate speech transcript; as tokens stream in, on_update(batch_index, text, replace) appends text to that batch, or replaces it"""
         try:
-            if not slides or len(slides) == 0:
-                raise Exception("No slide content, please upload a PDF file first")
+            transcript = self._start_generation(
+                slides, target_duration, words_per_minute, style, topic, audience, language,
+                model_name, expert_role, include_tips, on_update
+            ).result()
+            self.transcript = transcript
             
-            target_words = int(target_duration * words_per_minute)
-            words_per_slide = target_words // len(slides)
+            return transcript
             
-            system_prompt = self._create_system_prompt(
-                style, topic, audience, language, expert_role, words_per_slide, include_tips
+        except Exception as e:
+            raise _generation_error(e)
+    
+    def _start_generation(
+        self,
+        slides: List[Dict[str, Any]],
+        target_duration: int,
+        words_per_minute: float,
+        style: str,
+        topic: str,
+        audience: str,
+        language: str,
+        model_name: str = "gpt-5.1",
+        expert_role: Optional[str] = None,
+        include_tips: bool = False,
+        on_update: Optional[Callable[[int, str, bool], None]] = None
+    ) -> Future:
+        """Build the batch requests and schedule them on the event loop, returning the run's future"""
+        if not slides or len(slides) == 0:
+            raise Exception("No slide content, please upload a PDF file first")
+        
+        target_words = int(target_duration * words_per_minute)
+        words_per_slide = target_words // len(slides)
+        
+        system_prompt = _build_system_prompt(
+            style, topic, audience, language, expert_role, words_per_slide, include_tips
+        )
+        
+        tips_instruction = _TIPS_INSTRUCTION if include_tips else ""
+        # Base64 data URLs by image hash, shared by the batches of this run
+        data_urls = {}
+        
+        # One request per batch of slides, issued concurrently
+        batches = [
+            slides[start:start + _SLIDES_PER_REQUEST]
+            for start in range(0, len(slides), _SLIDES_PER_REQUEST)
+        ]
+        user_contents = [
+            self._create_user_content(
+                batch, len(slides), target_duration, words_per_minute,
+                target_words, words_per_slide, language, tips_instruction, data_urls,
+                previous_batch=batches[index - 1] if index else None
             )
+            for index, batch in enumerate(batches)
+        ]
+        request_options = [
+            self._create_request_options(batch, len(slides), words_per_slide, model_name, include_tips)
+            for batch in batches
+        ]
+        
+        return asyncio.run_coroutine_threadsafe(
+            self._stream_requests(
+                model_name, system_prompt, user_contents, request_options,
+                [batch[-1]["page"] for batch in batches], on_update
+            ),
+            self.loop
+        )
+    
+    def stream_transcript(self, *args, **kwargs) -> Iterator[str]:
+        """Yield the transcript so far as tokens arrive; takes generate_transcript's arguments"""
+        updates = queue.Queue()
+        try:
+            future = self._start_generation(
+                *args, on_update=lambda *update: updates.put(update), **kwargs
+            )
+        except Exception as e:
+            raise _generation_error(e)
+        # Every delta is queued before the run finishes, so None marks the end
+        future.add_done_callback(lambda _: updates.put(None))
+        
+        try:
+            # Streamed text chunks per batch; the event loop only queues deltas,
+            # so the transcript is assembled here, once per snapshot
+            parts = {}
+            finished = False
+            while not finished:
+                update = updates.get()
+                # Apply every queued delta before yielding, so a slow consumer gets one snapshot
+                while True:
+                    if update is None:
+                        finished = True
+                        break
+                    index, text, replace = update
+                    if replace:
+                        parts[index] = [text]
+                    else:
+                        parts.setdefault(index, []).append(text)
+                    if updates.empty():
+                        break
+                    update = updates.get()
+                if not finished:
+                    yield "\n\n".join(
+                        text for text in ("".join(parts[index]) for index in sorted(parts)) if text
+                    )
+        finally:
+            # Closed early (Stop or a rerun): cancel the requests still streaming
+            future.cancel()
+        
+        try:
+            transcript = future.result()
+        except Exception as e:
+            raise _generation_error(e)
+        self.transcript = transcript
+        yield transcript
+    
+    async def _stream_requests(
+        self,
+        model_name: str,
+        system_prompt: str,
+        user_contents: List[List[Dict]],
+        request_options: List[Dict],
+        last_pages: List[int],
+        on_update: Optional[Callable[[int, str, bool], None]] = None
+    ) -> str:
+        """Stream all batch requests concurrently and join the results in slide order"""
+        # Chunks per batch, joined once at the end rather than on every delta
+        parts = [[] for _ in user_contents]
+        # Bound in-flight requests so large decks stay within rate limits
+        semaphore = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+        
+        async def stream_one(index: int, user_content: List[Dict]):
+            async with semaphore:
+                await stream_request(index, user_content)
+        
+        async def stream_request(index: int, user_content: List[Dict]):
+            options = dict(request_options[index])
+            for attempt in range(2):
+                finish_reason = None
+                response = await self.client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_content}
+                    ],
+                    temperature=0.7,
+                    stream=True,
+                    **options
+                )
+                async for chunk in response:
+                    if not chunk.choices:
+                        continue
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts[index].append(delta)
+                        if on_update:
+                            on_update(index, delta, False)
+                if finish_reason != "length" or attempt:
+                    break
+                # Cut off at the token limit: retry the batch once with more room
+                options["max_completion_tokens"] *= _TRUNCATION_RETRY_FACTOR
+                parts[index] = []
+                if on_update:
+                    on_update(index, "", True)
             
-            tips_instruction = ""
-            if include_tips:
-                tips_instruction = """
-
-【Speech Tips Suggestions】
-Please include the following speech tips in appropriate places within the transcript (marked with [square brackets]):
-- [Gesture: Open arms] - When emphasizing a key point
-- [Gesture: Point to slide] - When explaining a chart
-- [Tone: Raise volume] - For key messages
-- [Tone: Slow down] - For important concepts
-- [Pause 2-3 seconds] - During section transitions
-- [Eye contact] - When interacting with the audience
-- [Movement: Move to center stage] - During opening or closing
-"""
-            
-            user_content = [
-                {
-                    "type": "text",
-                    "text": f"""
-Please generate a complete speech transcript based on the following slide images.
+            if finish_reason == "length":
+                parts[index] = [f"{''.join(parts[index]).rstrip()}\n\n{_TRUNCATION_NOTE}"]
+                if on_update:
+                    on_update(index, parts[index][0], True)
+        
+        tasks = [
+            asyncio.ensure_future(stream_one(index, user_content))
+            for index, user_content in enumerate(user_contents)
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            # gather would leave the other batches streaming (and billed) after
+            # one fails or the run is cancelled, so stop them here
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for task in done:
+            task.result()
+        
+        # Reasoning models take no stop sequences and others may word the heading
+        # differently, so drop any slide a batch wrote for the next batch
+        return "\n\n".join(
+            _trim_to_batch("".join(part), last_page).strip()
+            for part, last_page in zip(parts, last_pages)
+        )
+    
+    def _create_request_options(
+        self,
+        batch: List[Dict[str, Any]],
+        slide_count: int,
+        words_per_slide: int,
+        model_name: str,
+        include_tips: bool = False
+    ) -> Dict:
+        """Size the completion budget for one batch and stop it at the next batch's slide"""
+        # Roughly two tokens per word, plus room for slide headings and any tips markup
+        max_tokens = max(_MIN_COMPLETION_TOKENS, words_per_slide * len(batch) * 2) + _COMPLETION_TOKEN_BUFFER
+        if include_tips:
+            max_tokens += _TIPS_TOKENS_PER_SLIDE * len(batch)
+        options = {"max_completion_tokens": max_tokens}
+        
+        if model_name.startswith(_REASONING_MODEL_PREFIXES):
+            # Reasoning tokens count against the same limit, and these models reject stop
+            options["max_completion_tokens"] += _REASONING_TOKEN_HEADROOM
+        elif batch[-1]["page"] < slide_count:
+            next_page = batch[-1]["page"] + 1
+            options["stop"] = [f"\n\n{prefix}Slide {next_page}" for prefix in _STOP_HEADING_PREFIXES]
+        
+        return options
+    
+    def _create_user_content(
+        self,
+        batch: List[Dict[str, Any]],
+        slide_count: int,
+        target_duration: int,
+        words_per_minute: float,
+        target_words: int,
+        words_per_slide: int,
+        language: str,
+        tips_instruction: str,
+        data_urls: Dict[str, str],
+        previous_batch: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict]:
+        """Create the user message for one batch of slides"""
+        first_page = batch[0]["page"]
+        last_page = batch[-1]["page"]
+        batch_words = words_per_slide * len(batch)
+        
+        if len(batch) == slide_count:
+            scope = "the following slides"
+            flow_instruction = "Content flows smoothly with a clear opening and closing"
+        else:
+            scope = f"slides {first_page}-{last_page} of a {slide_count}-slide presentation, shown below"
+            if first_page == 1:
+                flow_instruction = f"Open the talk with a clear introduction, but do not conclude; the talk continues after slide {last_page}"
+            elif last_page == slide_count:
+                flow_instruction = "Continue the talk already in progress (no new introduction) and finish with a clear closing"
+            else:
+                flow_instruction = "Continue the talk already in progress: no new introduction and no conclusion"
+        
+        # Batches run concurrently, so hand over continuity through the
+        # preceding slides' text rather than their generated transcript
+        previous_context = ""
+        if previous_batch:
+            outline = "\n".join(
+                f"- Slide {slide['page']}: {slide['text'].splitlines()[0][:_OUTLINE_CHARS_PER_SLIDE]}"
+                for slide in previous_batch
+                if slide["text"] != NO_TEXT_PLACEHOLDER
+            )
+            if outline:
+                previous_context = f"\n\nThe preceding slides covered:\n{outline}"
+        
+        output_format = "\n\n".join(
+            f"Slide {slide['page']}\n[Speech content for slide {slide['page']}]" for slide in batch
+        )
+        
+        user_content = [
+            {
+                "type": "text",
+                "text": f"""
+Please generate the speech transcript for {scope}.{previous_context}
 
 Speech Parameters:
 - Total Duration: {target_duration} minutes
 - Speech Rate: Approximately {int(words_per_minute)} words per minute
 - Target Total Word Count: Approximately {target_words} words
+- Word Count for These Slides: Approximately {batch_words} words
 - Suggested Words per Slide: Approximately {words_per_slide} words
 - Output Language: {language}{tips_instruction}
 
 Output Format Requirements:
-Slide 1
-[Speech content for slide 1]
-
-Slide 2
-[Speech content for slide 2]
-
-...and so on
+{output_format}
 
 Please ensure:
 1. Carefully observe the visual elements, charts, and text on each slide
 2. The transcript for each page is natural and smooth, explaining the key points on the slide
-3. Content flows smoothly with a clear opening and closing
+3. {flow_instruction}
 4. Matches the specified speech style and tone
-5. Total word count is around {target_words} words (allow 10% variance)
+5. Word count for these slides is around {batch_words} words (allow 10% variance)
 """
+            }
+        ]
+        
+        # Add the slides: text-only pages as text, repeated images only once
+        first_seen = {}
+        for slide in batch:
+            if slide["image"] is None:
+                user_content.append({
+                    "type": "text",
+                    "text": f"--- Slide {slide['page']} (text only) ---\n{slide['text']}"
+                })
+                continue
+            if slide["hash"] in first_seen:
+                user_content.append({
+                    "type": "text",
+                    "text": f"Slide {slide['page']}: identical to slide {first_seen[slide['hash']]}, please reuse that visual context."
+                })
+                continue
+            first_seen[slide["hash"]] = slide["page"]
+            user_content.append({"type": "text", "text": f"Slide {slide['page']}:"})
+            user_content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": self._get_data_url(slide, data_urls),
+                    "detail": slide["detail"]
                 }
-            ]
-            
-            # Add all slide images
-            for slide in slides:
+            })
+            # Small text is hard to read at 512px, so send the extracted text alongside
+            if slide["detail"] == "low" and slide["text"] != NO_TEXT_PLACEHOLDER:
                 user_content.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/png;base64,{slide['image']}",
-                        "detail": "high"
-                    }
+                    "type": "text",
+                    "text": f"Slide {slide['page']} text:\n{slide['text']}"
                 })
-            
-            # Call OpenAI Vision API
-            response = self.client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                temperature=0.7,
-                max_completion_tokens=4000
-            )
-            
-            transcript = response.choices[0].message.content
-            self.transcript = transcript
-            
-            return transcript
-            
-        except Exception as e:
-            error_msg = str(e)
-            if "API key" in error_msg or "authentication" in error_msg.lower():
-                raise Exception("❌ API Key error, please check if your OpenAI API Key is correct")
-            elif "rate limit" in error_msg.lower():
-                raise Exception("❌ API request limit reached, please try again later")
-            elif "quota" in error_msg.lower():
-                raise Exception("❌ API quota exceeded, please check your OpenAI account balance")
-            else:
-                raise Exception(f"Transcript generation error: {error_msg}")
-    
-    def _create_system_prompt(
-        self,
-        style: str,
-        topic: str,
-        audience: str,
-        language: str,
-        expert_role: Optional[str],
-        words_per_slide: int,
-        include_tips: bool = False
-    ) -> str:
-        """Create system prompt"""
         
-        style_descriptions = {
-            "Lively": "Use a relaxed, lively tone with appropriate interactive and humorous elements",
-            "Serious": "Use a formal, professional tone maintaining academic rigor",
-            "Motivational": "Use inspiring language full of positive energy and motivation",
-            "Educational": "Use clear, easy-to-understand explanations, as if teaching students",
-            "Conversational": "Use a conversational tone, as if talking face-to-face with the audience"
-        }
-        
-        language_instructions = {
-            "Traditional Chinese": "Output in Traditional Chinese",
-            "English": "Output in English",
-            "Simplified Chinese": "Output in Simplified Chinese",
-            "Japanese": "Output in Japanese",
-            "Korean": "Output in Korean",
-            "Spanish": "Output in Spanish",
-            "French": "Output in French",
-            "German": "Output in German"
-        }
-        
-        role_intro = ""
-        if expert_role:
-            role_intro = f"You are a {expert_role}, "
-        
-        style_desc = style_descriptions.get(style, "Use a natural and smooth tone")
-        lang_inst = language_instructions.get(language, "Output in Traditional Chinese")
-        
-        tips_requirement = ""
-        if include_tips:
-            tips_requirement = """
-7. Include speech tips suggestions in appropriate places, marked with [square brackets], including:
-   - Gesture suggestions (e.g., open arms, point to slide, clench fist for emphasis)
-   - Tone suggestions (e.g., raise volume, slow down, emphasize)
-   - Pause timing (e.g., [Pause 2-3 seconds])
-   - Body language (e.g., eye contact, movement, lean forward)
-   These suggestions should blend naturally into the transcript to help the speaker better convey the message
-"""
-        
-        return f"""
-{role_intro}You are an experienced speaker and content creation expert.
+        return user_content
+    
+    def _get_data_url(self, slide: Dict[str, Any], data_urls: Dict[str, str]) -> str:
+        """Return the slide's JPEG as a data URL, encoding each image only once per run"""
+        url = data_urls.get(slide["hash"])
+        if url is None:
+            url = "data:image/jpeg;base64," + _b64encode_str(slide["image"])
+            data_urls[slide["hash"]] = url
+        return url
 
-Speech Topic: {topic}
-Target Audience: {audience}
-Speech Style: {style_desc}
-Language Requirement: {lang_inst}
 
-Your task is to create a natural, smooth, and engaging speech transcript based on the provided slide content.
+def _http_limits():
+    """Connection pool limits shared by the sync and async OpenAI clients"""
+    import httpx
+    
+    return httpx.Limits(
+        max_connections=_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=_HTTP_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=_HTTP_KEEPALIVE_EXPIRY
+    )
 
-Requirements:
-1. Content must be faithful to the slides but expressed in spoken language
-2. Approximately {words_per_slide} words per page, adjustable based on content importance
-3. Opening must be attractive, closing must be powerful
-4. Add transition phrases appropriately to ensure smooth flow
-5. Match the specified speech style and target audience
-6. Ensure content is professional and accurate, yet easy to understand{tips_requirement}
-"""
+
+@st.cache_resource(show_spinner=False)
+def _get_openai_client(api_key: str) -> "OpenAI":
+    """Shared OpenAI client per API key, reusing warm connections across reruns"""
+    import httpx
+    from openai import OpenAI
+    
+    return OpenAI(
+        api_key=api_key,
+        http_client=httpx.Client(http2=True, limits=_http_limits())
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Event loop running on a daemon thread, shared across reruns so async pools stay warm"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True, name="slidescript-loop").start()
+    return loop
+
+
+@st.cache_resource(show_spinner=False)
+def _get_async_openai_client(api_key: str) -> "AsyncOpenAI":
+    """Shared async OpenAI client per API key; only use it on _get_event_loop()"""
+    import httpx
+    from openai import AsyncOpenAI
+    
+    return AsyncOpenAI(
+        api_key=api_key,
+        http_client=httpx.AsyncClient(http2=True, limits=_http_limits())
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _extract_slides_cached(
+    pdf_bytes: bytes,
+    _progress: Optional[Dict[str, int]] = None,
+    _render_pool: Optional[ProcessPoolExecutor] = None
+) -> List[Dict[str, Any]]:
+    """Extract slides once per PDF content; reruns with the same upload hit the cache"""
+    return PDFProcessor().extract_slides(io.BytesIO(pdf_bytes), _progress, _render_pool)
+
+
+@st.cache_resource(show_spinner=False)
+def _get_render_pool() -> ProcessPoolExecutor:
+    """Process pool for rendering large decks, shared across sessions and reruns"""
+    # spawn: never fork the multi-threaded Streamlit server. Spawned workers
+    # re-import this script as __mp_main__ (main() stays behind the __name__
+    # guard), so they load streamlit and mutagen as well as slide_renderer
+    return ProcessPoolExecutor(
+        max_workers=_RENDER_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _replace_render_pool(broken_pool: ProcessPoolExecutor) -> ProcessPoolExecutor:
+    """Evict a broken render pool from the cache and return a working one"""
+    # Another session may already have replaced it; keep that pool
+    if _get_render_pool() is broken_pool:
+        _get_render_pool.clear()
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+    return _get_render_pool()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _analyze_audio_cached(audio_bytes: bytes, filename: str, api_key: str) -> float:
+    """Analyze speech rate once per audio sample instead of re-transcribing it"""
+    audio_file = io.BytesIO(audio_bytes)
+    # Whisper infers the container format from the file name
+    audio_file.name = filename
+    return AudioAnalyzer(_get_openai_client(api_key)).analyze_audio(audio_file)
+
+
+def _split_transcript_by_slide(transcript: str) -> Dict[int, str]:
+    """Split a (partial) transcript into per-slide text keyed by slide number"""
+    pieces = _SLIDE_HEADING.split(transcript)
+    # pieces = [preamble, number, title, text, number, title, text, ...]
+    sections = {}
+    for number, title, text in zip(pieces[1::3], pieces[2::3], pieces[3::3]):
+        text = text.strip()
+        if title:
+            text = f"**{title.strip('* ')}**\n\n{text}"
+        sections[int(number)] = text
+    return sections
+
+
+def _run_in_background(
+    task: Callable,
+    label: str,
+    progress: Optional[Dict[str, int]] = None
+):
+    """Run task off the script thread, polling it to keep a progress bar current"""
+    future = Future()
+    
+    def run():
+        try:
+            future.set_result(task())
+        except Exception as e:
+            future.set_exception(e)
+    
+    # A fresh thread carries this session's ScriptRunContext, so the st.cache_*
+    # calls inside task do not log "missing ScriptRunContext"; pooled threads
+    # would keep whichever session's context they were last given
+    thread = threading.Thread(target=run, daemon=True, name="slidescript-background")
+    add_script_run_ctx(thread, get_script_run_ctx())
+    thread.start()
+    # Fast tasks (e.g. cache hits) return before any spinner or bar is drawn
+    if wait([future], timeout=_BACKGROUND_POLL_INTERVAL).done:
+        return future.result()
+    with st.spinner(label):
+        progress_bar = st.progress(0.0) if progress is not None else None
+        while not wait([future], timeout=_BACKGROUND_POLL_INTERVAL).done:
+            if progress_bar and progress.get("total"):
+                done = progress.get("done", 0)
+                progress_bar.progress(
+                    done / progress["total"],
+                    text=f"{done}/{progress['total']} pages"
+                )
+        if progress_bar:
+            progress_bar.empty()
+    return future.result()
 
 
 # Streamlit Main Application
@@ -377,10 +924,13 @@ def main():
     # Initialize Session State
     if 'pdf_processor' not in st.session_state:
         st.session_state.pdf_processor = PDFProcessor()
-    if 'audio_analyzer' not in st.session_state:
-        st.session_state.audio_analyzer = AudioAnalyzer(api_key)
-    if 'transcript_generator' not in st.session_state:
-        st.session_state.transcript_generator = TranscriptGenerator(api_key)
+    # Rebuild API-bound services when the key changes; the HTTP clients
+    # themselves come from the cached per-key factories
+    if st.session_state.get('api_key') != api_key:
+        st.session_state.api_key = api_key
+        st.session_state.transcript_generator = TranscriptGenerator(
+            _get_async_openai_client(api_key), _get_event_loop()
+        )
     if 'current_wpm' not in st.session_state:
         st.session_state.current_wpm = 200
     
@@ -391,9 +941,21 @@ def main():
         st.subheader("📄 Step 1: Upload Slide PDF")
         pdf_file = st.file_uploader("Select PDF File", type=['pdf'])
         
-        if pdf_file:
+        # The loaded deck is kept in session, so reruns skip extraction entirely
+        if pdf_file and st.session_state.get("pdf_file_id") == pdf_file.file_id:
+            st.success(f"✅ Loaded {len(st.session_state.pdf_processor.slides_content)} slides")
+        elif pdf_file:
             try:
-                slides = st.session_state.pdf_processor.extract_slides(pdf_file)
+                pdf_bytes = pdf_file.getvalue()
+                render_pool = _get_render_pool()
+                progress = {}
+                slides = _run_in_background(
+                    lambda: _extract_slides_cached(pdf_bytes, _progress=progress, _render_pool=render_pool),
+                    "📄 Rendering slides...",
+                    progress
+                )
+                st.session_state.pdf_processor.slides_content = slides
+                st.session_state.pdf_file_id = pdf_file.file_id
                 st.success(f"✅ Loaded {len(slides)} slides")
             except Exception as e:
                 st.error(f"❌ {str(e)}")
@@ -410,13 +972,16 @@ def main():
         )
         
         if speed_option == "Auto Analysis":
-            audio_file = st.file_uploader("Upload 20s audio sample", type=['mp3', 'm4a', 'wav'])
+            audio_file = st.file_uploader("Upload 20s audio sample", type=_WHISPER_AUDIO_TYPES)
             if audio_file and st.button("🎵 Start Speech Rate Analysis"):
                 try:
-                    with st.spinner("Analyzing..."):
-                        wpm = st.session_state.audio_analyzer.analyze_audio(audio_file)
-                        st.session_state.current_wpm = int(wpm)
-                        st.success(f"✅ Your Speech Rate: {st.session_state.current_wpm} words/min")
+                    audio_bytes = audio_file.getvalue()
+                    wpm = _run_in_background(
+                        lambda: _analyze_audio_cached(audio_bytes, audio_file.name, api_key),
+                        "Analyzing..."
+                    )
+                    st.session_state.current_wpm = int(wpm)
+                    st.success(f"✅ Your Speech Rate: {st.session_state.current_wpm} words/min")
                 except Exception as e:
                     st.error(f"❌ {str(e)}")
         else:
@@ -482,8 +1047,15 @@ def main():
         else:
             try:
                 with st.spinner("🔄 Generating transcript, please wait..."):
-                    transcript = st.session_state.transcript_generator.generate_transcript(
-                        slides=st.session_state.pdf_processor.slides_content,
+                    # Show each slide's text in its own panel as tokens arrive
+                    slides = st.session_state.pdf_processor.slides_content
+                    progress_bar = st.progress(0.0)
+                    slide_outputs = {
+                        slide["page"]: st.expander(f"Slide {slide['page']}", expanded=index < 3).empty()
+                        for index, slide in enumerate(slides)
+                    }
+                    transcript_stream = st.session_state.transcript_generator.stream_transcript(
+                        slides=slides,
                         target_duration=duration,
                         words_per_minute=st.session_state.current_wpm,
                         style=style,
@@ -494,6 +1066,19 @@ def main():
                         expert_role=expert_role if expert_role else None,
                         include_tips=include_tips
                     )
+                    # Last text shown per panel, so each snapshot only redraws changed slides
+                    rendered = {}
+                    for transcript in transcript_stream:
+                        sections = _split_transcript_by_slide(transcript)
+                        for page, text in sections.items():
+                            if page in slide_outputs and rendered.get(page) != text:
+                                slide_outputs[page].markdown(text)
+                                rendered[page] = text
+                        progress_bar.progress(
+                            min(len(sections) / len(slides), 1.0),
+                            text=f"{len(sections)}/{len(slides)} slides"
+                        )
+                    progress_bar.empty()
                     
                     st.success("✅ Transcript Generation Complete!")
                     
@@ -0,0 +1,107 @@
+"""
+Slide Renderer
+Rasterize PDF pages into slide dicts for the Vision API. Kept in its own
+module so render worker processes can import it without loading the app.
+"""
+
+import hashlib
+from typing import Any, Dict, Iterator, List
+
+
+# Slide rendering sized to what the Vision API keeps: high detail fits
+# 2048px and then scales the short side to 768px, low detail uses 512px
+_HIGH_DETAIL_LONG_EDGE = 2048
+_HIGH_DETAIL_SHORT_EDGE = 768
+_LOW_DETAIL_EDGE = 512
+_MAX_RENDER_ZOOM = 2.0
+_JPEG_QUALITY = 85
+
+# Slides with this many vector drawings, or an embedded image covering this
+# share of the page, are treated as charts/figures and sent with high detail
+_CHART_DRAWING_THRESHOLD = 20
+_FIGURE_AREA_RATIO = 0.25
+
+# Pages with no drawings or images and at least this much text skip the image
+_TEXT_ONLY_MIN_CHARS = 30
+NO_TEXT_PLACEHOLDER = "[No text content on this page]"
+
+# Pages rendered between MuPDF store flushes
+_STORE_SHRINK_INTERVAL = 8
+
+
+def _choose_detail(page, drawing_count: int) -> str:
+    """Pick the Vision API detail level for a page: high for charts/figures, low for text"""
+    if drawing_count >= _CHART_DRAWING_THRESHOLD:
+        return "high"
+    page_area = abs(page.rect)
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info["bbox"]
+        if page_area and abs((x1 - x0) * (y1 - y0)) / page_area >= _FIGURE_AREA_RATIO:
+            return "high"
+    return "low"
+
+
+def _render_page(page) -> Dict[str, Any]:
+    """Render a single PDF page into a slide dict"""
+    import fitz  # PyMuPDF
+    
+    text = page.get_text().strip()
+    drawings = page.get_drawings()
+    
+    # Pure-text pages are sent as text, so skip rasterizing them
+    if len(text) > _TEXT_ONLY_MIN_CHARS and not drawings and not page.get_images():
+        return {
+            "page": page.number + 1,
+            "text": text,
+            "image": None,
+            "hash": None,
+            "detail": None
+        }
+    
+    # Render at the resolution the API uses for this detail level (PDF units are 72 dpi)
+    detail = _choose_detail(page, len(drawings))
+    long_edge = max(page.rect.width, page.rect.height)
+    short_edge = min(page.rect.width, page.rect.height)
+    if detail == "high":
+        zoom = min(_HIGH_DETAIL_LONG_EDGE / long_edge, _HIGH_DETAIL_SHORT_EDGE / short_edge)
+    else:
+        zoom = _LOW_DETAIL_EDGE / long_edge
+    zoom = min(_MAX_RENDER_ZOOM, zoom)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    # Keep raw JPEG bytes; base64 is only applied when building the request
+    img_data = pix.tobytes("jpeg", jpg_quality=_JPEG_QUALITY)
+    # Release the pixel buffer now rather than when the page goes out of scope
+    pix = None
+    
+    return {
+        "page": page.number + 1,
+        "text": text if text else NO_TEXT_PLACEHOLDER,
+        "image": img_data,
+        "hash": hashlib.blake2b(img_data, digest_size=16).hexdigest(),
+        "detail": detail
+    }
+
+
+def iter_rendered_pages(pdf_bytes: bytes, page_numbers: List[int]) -> Iterator[Dict[str, Any]]:
+    """Yield rendered slides for the given pages from a document opened by the caller's worker"""
+    import fitz  # PyMuPDF
+    
+    # Broken-but-renderable pages are common in exported decks; keep MuPDF quiet
+    fitz.TOOLS.mupdf_display_errors(False)
+    # PyMuPDF objects cannot be shared between threads or processes,
+    # so every worker opens its own in-memory document
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        for index, page_num in enumerate(page_numbers, start=1):
+            yield _render_page(doc[page_num])
+            # Trim MuPDF's resource cache so RSS does not grow with deck size
+            if index % _STORE_SHRINK_INTERVAL == 0:
+                fitz.TOOLS.store_shrink(100)
+    finally:
+        doc.close()
+        fitz.TOOLS.store_shrink(100)
+
+
+def render_pages(pdf_bytes: bytes, page_numbers: List[int]) -> List[Dict[str, Any]]:
+    """Render a batch of pages; this is the task run by render worker processes"""
+    return list(iter_rendered_pages(pdf_bytes, page_numbers))